@@ -0,0 +1,249 @@
+# Conversion logic for the TopDecked / TCG ImportErrors → TCG PowerTools web app
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import streamlit as st
+import io
+import os
+import json
+import time
+import sqlite3
+import requests
+from contextlib import closing
+from types import MappingProxyType
+
+SCRYFALL_SETS_URL = "https://api.scryfall.com/sets"
+SCRYFALL_COLLECTION_URL = "https://api.scryfall.com/cards/collection"
+SCRYFALL_BATCH_SIZE = 75
+FOIL_VALUES = frozenset({"true", "yes", "foil"})
+BASIC_LANDS = frozenset({"Plains", "Island", "Swamp", "Mountain", "Forest"})
+
+STANDARD_COLUMNS = ["QUANTITY", "NAME", "SETNAME", "SETCODE", "FINISH", "CONDITION", "LANG", "NOTES"]
+ERROR_FORMAT_COLUMNS = {
+    "quantity": "QUANTITY",
+    "name": "NAME",
+    "expansion": "SETNAME",
+    "foil": "_foil",
+    "condition": "CONDITION",
+    "language": "LANG",
+    "comment": "NOTES",
+}
+
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "MTGconverter/1.0", "Accept": "application/json"})
+
+@st.cache_data(max_entries=8, ttl=3600, show_spinner=False)
+def parse_upload(raw_bytes):
+    return pd.read_csv(io.BytesIO(raw_bytes), dtype=str)
+
+def remove_basic_lands(df):
+    return df[~df["NAME"].isin(BASIC_LANDS)]
+
+def consolidate_duplicates(df):
+    group_cols = ["NAME", "SETNAME", "SETCODE", "FINISH", "CONDITION", "LANG", "NOTES"]
+    df = df.assign(QUANTITY=pd.to_numeric(df["QUANTITY"], errors="coerce").fillna(0).astype(int))
+    return df.groupby(group_cols, dropna=False, as_index=False).agg({"QUANTITY": "sum"})
+
+def consolidate_sets(df):
+    group_key = df["NAME"].str.lower().str.strip().rename("GROUP_KEY")
+    per_set = df.groupby([group_key, df["SETNAME"]])["QUANTITY"].sum().reset_index()
+    winners = per_set.loc[per_set.groupby("GROUP_KEY")["QUANTITY"].idxmax()].set_index("GROUP_KEY")["SETNAME"]
+
+    group = df.groupby(group_key)
+    total = group["QUANTITY"].transform("sum")
+    mixed = group["SETNAME"].transform("nunique") > 1
+
+    order = group_key.sort_values(kind="stable").index
+    keep = order[~(mixed[order] & group_key[order].duplicated()).to_numpy()]
+    out = df.loc[keep].copy()
+    rows = mixed.loc[keep].to_numpy()
+
+    out.loc[rows, "SETNAME"] = group_key.loc[keep][rows].map(winners).to_numpy()
+    out.loc[rows, "QUANTITY"] = total.loc[keep][rows].to_numpy()
+    out.loc[rows, "NOTES"] = (out.loc[rows, "NOTES"].fillna("") + " | Sets consolidated").str.strip(" | ").to_numpy()
+
+    return out.reset_index(drop=True)
+
+PRODUCTS_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "products_singles_1.json")
+PRODUCTS_PARQUET = os.path.splitext(PRODUCTS_JSON)[0] + ".parquet"
+
+def read_cached_mapping():
+    try:
+        if os.path.getmtime(PRODUCTS_PARQUET) >= os.path.getmtime(PRODUCTS_JSON):
+            return pd.read_parquet(PRODUCTS_PARQUET)
+    except Exception:
+        pass
+    return None
+
+@st.cache_resource(show_spinner=False)
+def load_cardmarket_mapping():
+    cm = read_cached_mapping()
+    if cm is not None:
+        return cm
+
+    try:
+        with open(PRODUCTS_JSON, "r", encoding="utf-8") as f:
+            products = json.load(f).get("products", [])
+    except Exception:
+        products = []
+
+    cm = pd.DataFrame(products, columns=["name", "idExpansion", "idProduct"]).dropna(subset=["name"])
+    cm["name"] = cm["name"].astype(str).str.strip().str.lower()
+    cm["idExpansion"] = cm["idExpansion"].astype(str).str.strip().str.lower()
+    cm["idProduct"] = cm["idProduct"].astype(str)
+    cm = cm[cm["name"] != ""]
+    cm = cm.drop_duplicates(["name", "idExpansion"]).reset_index(drop=True)
+
+    if not cm.empty:
+        try:
+            cm.to_parquet(PRODUCTS_PARQUET, index=False)
+        except Exception:
+            pass
+    return cm
+
+def get_cardmarket_ids(df, cm):
+    keys = pd.DataFrame({
+        "name": df["NAME"].astype(str).str.strip().str.lower(),
+        "idExpansion": df["SETNAME"].fillna("").astype(str).str.strip().str.lower(),
+    })
+    by_set = keys.merge(cm, on=["name", "idExpansion"], how="left")["idProduct"]
+    by_name = keys.merge(cm[["name", "idProduct"]].drop_duplicates("name"), on="name", how="left")["idProduct"]
+    return by_set.fillna(by_name).fillna("").set_axis(df.index)
+
+@st.cache_resource(ttl=86400, show_spinner=False)
+def fetch_scryfall_sets():
+    response = SESSION.get(SCRYFALL_SETS_URL)
+    if response.status_code == 200:
+        data = response.json()
+        return MappingProxyType({s['name'].lower(): s['code'] for s in data['data']})
+    return MappingProxyType({})
+
+SCRYFALL_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scryfall_ids.sqlite")
+SCRYFALL_CACHE_SCHEMA = "CREATE TABLE IF NOT EXISTS scryfall_ids (name TEXT, setcode TEXT, id TEXT, PRIMARY KEY (name, setcode))"
+
+def read_scryfall_cache(identifiers):
+    found = {}
+    try:
+        with closing(sqlite3.connect(SCRYFALL_CACHE)) as conn:
+            conn.execute(SCRYFALL_CACHE_SCHEMA)
+            for key in identifiers:
+                row = conn.execute("SELECT id FROM scryfall_ids WHERE name = ? AND setcode = ?", key).fetchone()
+                if row:
+                    found[key] = row[0]
+    except sqlite3.Error:
+        pass
+    return found
+
+def write_scryfall_cache(found):
+    if not found:
+        return
+    try:
+        with closing(sqlite3.connect(SCRYFALL_CACHE)) as conn, conn:
+            conn.execute(SCRYFALL_CACHE_SCHEMA)
+            conn.executemany(
+                "INSERT OR REPLACE INTO scryfall_ids VALUES (?, ?, ?)",
+                [(name, setcode, card_id) for (name, setcode), card_id in found.items()],
+            )
+    except sqlite3.Error:
+        pass
+
+def fetch_scryfall_batch(batch):
+    try:
+        response = SESSION.post(
+            SCRYFALL_COLLECTION_URL,
+            json={"identifiers": [{"name": name, "set": setcode} for name, setcode in batch]},
+        )
+        response.raise_for_status()
+        payload = response.json()
+    except (requests.RequestException, ValueError):
+        return {}
+
+    # Cards come back in request order with the not_found identifiers left out
+    not_found = {(i.get("name", "").lower(), i.get("set", "").lower()) for i in payload.get("not_found", [])}
+    sent = [key for key in batch if key not in not_found]
+    cards = payload.get("data", [])
+    if len(sent) != len(cards):
+        return {}
+    return {key: card.get("id", "") for key, card in zip(sent, cards)}
+
+def fetch_scryfall_collection(identifiers):
+    found = read_scryfall_cache(identifiers)
+    missing = [key for key in identifiers if key not in found]
+    fetched = {}
+    for start in range(0, len(missing), SCRYFALL_BATCH_SIZE):
+        if start:
+            time.sleep(0.1)
+        fetched.update(fetch_scryfall_batch(missing[start:start + SCRYFALL_BATCH_SIZE]))
+    write_scryfall_cache(fetched)
+    found.update(fetched)
+    return found
+
+def get_scryfall_ids(df):
+    sets = fetch_scryfall_sets()
+    names = df["NAME"].fillna("").astype(str).str.strip().str.lower()
+    setcodes = df["SETNAME"].fillna("").astype(str).str.strip().str.lower().map(sets).fillna("")
+    keys = pd.Series(list(zip(names, setcodes)), index=df.index, dtype=object)
+    identifiers = tuple(sorted(key for key in set(keys) if key[0] and key[1]))
+    found = fetch_scryfall_collection(identifiers)
+    return keys.map(found).fillna("")
+
+def convert_error_format(df):
+    df.columns = df.columns.str.strip().str.lower()
+    required = ["quantity", "name"]
+    for col in required:
+        if col not in df.columns:
+            raise ValueError(f"Missing required column '{col}' in TCG ImportErrors format.")
+
+    df = df.rename(columns=ERROR_FORMAT_COLUMNS).reindex(columns=STANDARD_COLUMNS + ["_foil"], fill_value="")
+    foil = df["_foil"].astype(str).str.strip().str.lower()
+    df["FINISH"] = np.where(foil.isin(FOIL_VALUES), "Foil", "")
+    return df.drop(columns="_foil")
+
+def convert_topdecked_format(df):
+    df.columns = df.columns.str.strip().str.upper()
+    required = ["QUANTITY", "NAME"]
+    for col in required:
+        if col not in df.columns:
+            raise ValueError(f"Missing required column '{col}' in TopDecked format.")
+    for col in ["SETNAME", "SETCODE", "FINISH", "CONDITION", "LANG", "NOTES"]:
+        if col not in df.columns:
+            df[col] = ""
+    return df
+
+def convert_to_tcgpowertools_format(df, default_condition, default_language, fetch_ids=False, use_scryfall=False):
+    if fetch_ids:
+        if use_scryfall:
+            ids = get_scryfall_ids(df)
+        else:
+            ids = get_cardmarket_ids(df, load_cardmarket_mapping())
+    else:
+        ids = ""
+    filled = df[["SETNAME", "CONDITION", "LANG", "NOTES"]].fillna({
+        "SETNAME": "",
+        "CONDITION": default_condition,
+        "LANG": default_language,
+        "NOTES": "",
+    })
+    return pd.DataFrame({
+        "idProduct": ids,
+        "quantity": df["QUANTITY"],
+        "name": df["NAME"],
+        "set": filled["SETNAME"],
+        "condition": filled["CONDITION"],
+        "language": filled["LANG"],
+        "isFoil": df["FINISH"].str.lower().eq("foil"),
+        "isPlayset": "",
+        "isSigned": "",
+        "isFirstEd": "",
+        "price": "",
+        "comment": filled["NOTES"],
+    }, index=df.index, copy=False)
+
+def to_csv_bytes(df):
+    # Arrow writes booleans as true/false; keep the True/False that to_csv produced
+    df = df.astype({col: str for col in df.select_dtypes("bool").columns})
+    csv_buffer = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), csv_buffer)
+    return csv_buffer.getvalue()